@@ -0,0 +1,153 @@
+import argparse, json, os, platform, random, tracemalloc
+from contextlib import nullcontext
+from math import inf, log
+from multiprocessing import Pool
+from time import perf_counter
+
+from solution import (
+    Budget, BudgetExhausted, Stats, input_clauses, input_user_cmds, resolution
+)
+
+thresholds = {2: 1.0, 3: 4.267, 4: 9.931, 5: 21.117, 6: 43.37, 7: 87.79}
+
+def horn_chain(depth: int):
+    return ["a0", *(f"~a{i} v a{i+1}" for i in range(depth)), f"a{depth}"]
+
+def random_kcnf(n_vars: int, k: int, ratio: float, rng: random.Random):
+    ratio = ratio or thresholds.get(k, 2**k * log(2) - (1 + log(2)) / 2)
+    clauses = [
+        ' v '.join(
+            f"{'~' * rng.randint(0, 1)}x{v}" for v in rng.sample(range(n_vars), k)
+        )
+        for _ in range(round(ratio * n_vars))
+    ]
+    return [*clauses, f"{'~' * rng.randint(0, 1)}x{rng.randrange(n_vars)}"]
+
+def cooking_stream(
+        kb: 'list[str]', n_cmds: int, mix: 'tuple[float]', rng: random.Random
+    ):
+    atoms = sorted({lit.lstrip('~') for line in kb for lit in line.split(' v ')})
+    present = list(dict.fromkeys(kb))
+    user_cmds = []
+    for cmd in rng.choices("?+-", mix, k=n_cmds):
+        if cmd == '-' and present:
+            user_cmds.append(f"{present.pop(rng.randrange(len(present)))} -")
+        elif cmd == '+':
+            clause = rng.choice(atoms)
+            if clause not in present: present.append(clause)
+            user_cmds.append(f"{clause} +")
+        else:
+            user_cmds.append(f"{rng.choice(atoms)} ?")
+    return user_cmds
+
+def corpus(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    for depth in args.depths:
+        yield f"resolution_horn_chain_{depth}", "resolution", horn_chain(depth), None
+    for n_vars in args.vars:
+        kb = random_kcnf(n_vars, args.k, args.ratio, rng)
+        yield f"resolution_random_{args.k}cnf_{n_vars}", "resolution", kb, None
+    for n_cmds in args.cmds:
+        kb = horn_chain(args.cooking_depth)
+        user_cmds = cooking_stream(kb, n_cmds, args.mix, rng)
+        yield f"cooking_{args.cooking_depth}_{n_cmds}", "cooking", kb, user_cmds
+
+def write_corpus(directory: str, args: argparse.Namespace):
+    os.makedirs(directory, exist_ok=True)
+    for name, task, kb, user_cmds in corpus(args):
+        with open(os.path.join(directory, f"{name}.txt"), 'w') as f:
+            f.write('\n'.join(kb) + '\n')
+        if user_cmds is not None:
+            with open(os.path.join(directory, f"{name}_input.txt"), 'w') as f:
+                f.write('\n'.join(user_cmds) + '\n')
+
+def run(kb: 'list[str]', user_cmds: 'list[str]', args: argparse.Namespace, pool: Pool):
+    clauses, goal = input_clauses(kb)
+    queries = [(clauses, goal)]
+    if user_cmds is not None:
+        clauses.add(goal)
+        queries = []
+        for clause, cmd in input_user_cmds(user_cmds):
+            if cmd == '?': queries.append((clauses.copy(), clause))
+            elif cmd == '+': clauses.add(clause)
+            elif cmd == '-': clauses.remove(clause)
+
+    result = {"queries": len(queries), "proved": 0, "exhausted": 0, "peak_clauses": 0}
+    result.update(dict.fromkeys(Stats.counters, 0))
+    for clauses, goal in queries:
+        stats = Stats()
+        budget = Budget(args.max_clauses, args.max_rounds, args.timeout)
+        try:
+            _, resolvent = resolution(clauses, goal, stats, budget, pool, args.jobs)
+            result["proved"] += resolvent is not None
+        except BudgetExhausted:
+            result["exhausted"] += 1
+        for counter, value in stats.counts.items():
+            result[counter] += value
+        result["peak_clauses"] = max(result["peak_clauses"], stats.peak)
+    return result
+
+def benchmark(args: argparse.Namespace, pool: Pool):
+    for name, task, kb, user_cmds in corpus(args):
+        times = []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            result = run(kb, user_cmds, args, pool)
+            times.append(perf_counter() - start)
+
+        tracemalloc.start()
+        run(kb, user_cmds, args, pool)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            "name": name, "task": task, "kb_size": len(kb),
+            "commands": len(user_cmds or ()), **result,
+            "seconds": min(times), "peak_memory_mb": peak_memory / 2**20
+        }
+        print(json.dumps(result))
+        yield result
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--depths", type=int, nargs='*', default=[10, 50, 100, 200])
+    parser.add_argument("--vars", type=int, nargs='*', default=[8, 10, 12])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ratio", type=float)
+    parser.add_argument("--cmds", type=int, nargs='*', default=[100, 1000])
+    parser.add_argument("--cooking-depth", type=int, default=20)
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.6, 0.2, 0.2])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--max-clauses", type=int, default=20000)
+    parser.add_argument("--max-rounds", type=int, default=inf)
+    parser.add_argument("--timeout", type=float, default=30.)
+    parser.add_argument("--corpus")
+    parser.add_argument("--report")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+
+    if args.corpus:
+        write_corpus(args.corpus, args)
+
+    with Pool(args.jobs) if args.jobs > 1 else nullcontext() as pool:
+        results = list(benchmark(args, pool))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({
+                "python": platform.python_version(), "platform": platform.platform(),
+                "args": {
+                    k: v if v != inf else None for k, v in vars(args).items()
+                    if k not in ("corpus", "report")
+                },
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,24 @@
-import argparse
-from collections import deque
+import argparse, json, os
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from math import inf
+from multiprocessing import Pool, active_children
+from time import perf_counter, time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 class Clause:
     sep = " v "
 
-    def __init__(self, raw_clause: str, sos=False, parents: 'tuple[Clause]'=None):
-        self.literals = frozenset(raw_clause.split(Clause.sep))
+    def __init__(self, literals: 'frozenset[str]', sos=False, parents: 'tuple[Clause]'=None):
+        self.literals = literals
         self.sos = sos
         self.parents = parents
-        self.nil = not raw_clause
+        self.nil = not literals
+        self.code = None
     
     def __eq__(self, other: 'Clause'):
         return self.literals == other.literals
@@ -20,10 +30,133 @@ class Clause:
         return Clause.sep.join(self.literals) if not self.nil else "NIL"
     
     def negation(self):
-        return {Clause(negated(lit), sos=True) for lit in self.literals}
+        return {Clause(frozenset((negated(lit),)), sos=True) for lit in self.literals}
     
     def is_tautology(self):
         return any(negated(lit) in self.literals for lit in self.literals)
+    
+    def encoded(self):
+        if self.code is None:
+            self.code = tuple(map(symbols.encode, self.literals))
+        return self.code
+    
+    @staticmethod
+    def parsed(raw_clause: str):
+        return Clause(frozenset(raw_clause.split(Clause.sep)) if raw_clause else frozenset())
+
+    @staticmethod
+    def decoded(code: 'tuple[int]', parents: 'tuple[Clause]'):
+        clause = Clause(frozenset(map(symbols.decode, code)), sos=True, parents=parents)
+        clause.code = code
+        return clause
+
+class Symbols:
+    def __init__(self):
+        self.codes = {}
+        self.literals = {}
+    
+    def add(self, lit: str):
+        atom = lit[1:] if lit[0] == '~' else lit
+        code = len(self.literals) // 2 + 1
+        self.codes[atom], self.codes[f"~{atom}"] = code, -code
+        self.literals[code], self.literals[-code] = atom, f"~{atom}"
+    
+    def encode(self, lit: str):
+        if lit not in self.codes: self.add(lit)
+        return self.codes[lit]
+    
+    def decode(self, code: int):
+        return self.literals[code]
+
+symbols = Symbols()
+
+class Stats:
+    counters = (
+        "rounds", "pairs_considered", "pairs_resolved",
+        "resolvents", "tautologies", "duplicates", "known", "subsumed"
+    )
+
+    def __init__(self, trace=None, timing=False):
+        self.counts = dict.fromkeys(Stats.counters, 0)
+        self.timing = timing # per-pair timers are only paid for when asked
+        self.time = defaultdict(float) # --jobs times wait_workers instead of select_clauses/resolve
+        self.peak = 0
+        self.trace = trace
+    
+    def timed(self, name: str, f, *args):
+        if not self.timing: return f(*args)
+        start = perf_counter()
+        result = f(*args)
+        self.time[name] += perf_counter() - start
+        return result
+    
+    def timed_iter(self, name: str, iterable):
+        if not self.timing: return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name: str, iterable):
+        it = iter(iterable)
+        while True:
+            start = perf_counter()
+            item = next(it, None)
+            self.time[name] += perf_counter() - start
+            if item is None: return
+            yield item
+    
+    def end_round(self, goal: 'Clause', clauses: 'set[Clause]', new: 'set[Clause]'):
+        self.peak = max(self.peak, len(clauses) + len(new))
+        if self.trace is None: return
+
+        print(json.dumps({
+            "goal": str(goal), **self.counts,
+            "clauses": len(clauses), "new": len(new), "peak_clauses": self.peak,
+            "time": self.time
+        }), file=self.trace)
+
+class BudgetExhausted(Exception):
+    pass
+
+class Budget:
+    memory_every = 1024 # pairs between two memory checks
+
+    def __init__(self, max_clauses=inf, max_rounds=inf, timeout=inf, max_memory=inf):
+        self.max_clauses = max_clauses
+        self.max_rounds = max_rounds
+        self.timeout = timeout
+        self.max_memory = max_memory
+    
+    def start(self):
+        self.deadline = perf_counter() + self.timeout
+        self.checks = 0
+        # memory is counted from here on, since freed memory is not always given back to the OS
+        self.baseline = rss() if self.max_memory < inf else 0
+    
+    def check_rounds(self, rounds: int):
+        if rounds >= self.max_rounds:
+            raise BudgetExhausted(f"round limit of {self.max_rounds} reached")
+        self.check_memory()
+    
+    def check(self, clauses: int):
+        if clauses > self.max_clauses:
+            raise BudgetExhausted(f"clause limit of {self.max_clauses} exceeded")
+        if perf_counter() > self.deadline:
+            raise BudgetExhausted(f"time limit of {self.timeout} s reached")
+        self.checks += 1
+        if self.checks % Budget.memory_every == 0: self.check_memory()
+
+    def check_memory(self):
+        if self.max_memory < inf and rss() - self.baseline > self.max_memory * 2**20:
+            raise BudgetExhausted(f"memory limit of {self.max_memory} MB reached")
+
+def rss():
+    # current resident set of this process and its --jobs workers
+    if psutil is not None:
+        process = psutil.Process()
+        return sum(p.memory_info().rss for p in (process, *process.children(recursive=True)))
+    pids = (os.getpid(), *(p.pid for p in active_children()))
+    return os.sysconf("SC_PAGE_SIZE") * sum(
+        int(open(f"/proc/{pid}/statm").read().split()[1]) for pid in pids
+    )
 
 def negated(lit: str):
     return f"~{lit}" if lit[0] != '~' else lit[1:]
@@ -54,27 +187,128 @@ def resolve(c1: Clause, c2: Clause):
     res_literals = set(c1.literals.union(c2.literals))
     res_literals.remove(res_by)
     res_literals.remove(negated(res_by))
+    # built from a list so the literals print in the same order as before
+    return Clause(frozenset(list(res_literals)), sos=True, parents=(c1, c2))
+
+def resolve_round(
+        clauses: 'set[Clause]', new: 'set[Clause]', resolved: set,
+        stats: Stats, budget: Budget
+    ):
+    counts = stats.counts
+    for (c1, c2) in stats.timed_iter("select_clauses", select_clauses(clauses)):
+        counts["pairs_considered"] += 1
+        if (c1, c2) in resolved or (c2, c1) in resolved: continue
+
+        counts["pairs_resolved"] += 1
+        resolvent = stats.timed("resolve", resolve, c1, c2)
+        if resolvent is None:
+            counts["tautologies"] += 1
+        else:
+            counts["resolvents"] += 1
+            if resolvent.nil: return resolvent
+            new.add(resolvent)
+        resolved.add((c1, c2))
+        budget.check(len(clauses) + len(new))
+
+def resolve_rows(task: tuple):
+    codes, sos, old, old_sos, rows, deadline, room = task
+    literals = [frozenset(code) for code in codes]
+    resolvents, tautologies, considered, distinct = [], 0, 0, set()
+    for i in rows:
+        if time() > deadline or len(distinct) > room: break # the round is over budget anyway
+        c1 = literals[i]
+        for j in range(i + 1, len(codes)):
+            if not (sos[i] or sos[j]): continue
+
+            c2 = literals[j]
+            clash = [lit for lit in c1 if -lit in c2]
+            if not clash: continue
+            considered += 1
+            if old[i] and old[j] and (old_sos[i] or old_sos[j]): continue # resolved last round
+            if len(clash) > 1:
+                tautologies += 1
+                continue
+
+            res_by = clash[0]
+            resolvent = c1.union(c2) - {res_by, -res_by}
+            resolvents.append((i, j, tuple(resolvent)))
+            if room < inf: distinct.add(resolvent)
+    return resolvents, tautologies, considered
+
+def resolve_round_parallel(
+        clauses: 'set[Clause]', new: 'set[Clause]', previous: 'dict[Clause, bool]',
+        stats: Stats, budget: Budget, pool: Pool, jobs: int
+    ):
+    counts = stats.counts
+    clause_list = list(clauses)
+    codes = tuple(c.encoded() for c in clause_list)
+    sos = bytes(c.sos for c in clause_list)
+    old = bytes(c in previous for c in clause_list)
+    old_sos = bytes(previous.get(c, False) for c in clause_list)
+
+    # one strided task per worker, so the clause set is pickled once per worker and round;
+    # workers stop early on a wall-clock deadline or once they alone overflow the clause limit
+    deadline = time() + (budget.deadline - perf_counter())
+    room = budget.max_clauses - len(clauses)
+    tasks = (
+        (codes, sos, old, old_sos, range(k, len(codes), jobs), deadline, room)
+        for k in range(jobs)
+    )
+    results, distinct = [], set()
+    # wall time spent waiting on the workers, kept apart from the serial per-pair resolve time
+    for resolvents, tautologies, considered in stats.timed_iter(
+            "wait_workers", pool.imap_unordered(resolve_rows, tasks)
+        ):
+        counts["pairs_considered"] += considered
+        counts["pairs_resolved"] += len(resolvents) + tautologies
+        counts["tautologies"] += tautologies
+        counts["resolvents"] += len(resolvents)
+        results.extend(resolvents)
+        distinct.update(frozenset(code) for _, _, code in resolvents)
+    # checked once every worker is back: raising with tasks in flight can hang Pool.terminate
+    budget.check(len(clauses) + len(distinct))
     
-    raw_clause = Clause.sep.join(res_literals)
-    return Clause(raw_clause, sos=True, parents=(c1, c2))
+    results.sort() # same pair order as select_clauses
+    for i, j, code in results:
+        resolvent = Clause.decoded(code, (clause_list[i], clause_list[j]))
+        if resolvent.nil: return resolvent
+        new.add(resolvent)
+
+def resolution(
+        clauses: 'set[Clause]', goal: Clause,
+        stats: Stats=None, budget: Budget=None, pool: Pool=None, jobs=1
+    ):
+    stats, budget = stats or Stats(), budget or Budget()
+    counts = stats.counts
+    budget.start()
 
-def resolution(clauses: 'set[Clause]', goal: Clause):
     clauses.update(goal.negation())
     clauses = remove_irrelevant(clauses) # deletion strategy
-    clauses = remove_redundant(clauses, clauses)
-    new, resolved = set(), set()
+    clauses = stats.timed("remove_redundant", remove_redundant, clauses, clauses)
+    stats.peak = len(clauses)
+    new, resolved, previous = set(), set(), {}
     while True:
-        for (c1, c2) in select_clauses(clauses):
-            if (c1, c2) in resolved or (c2, c1) in resolved: continue
-            resolvent = resolve(c1, c2)
-            if resolvent is not None:
-                if resolvent.nil: return goal, resolvent
-                new.add(resolvent)
-            resolved.add((c1, c2))
+        budget.check_rounds(counts["rounds"])
+        budget.check(len(clauses))
+        counts["rounds"] += 1
+        produced = counts["resolvents"]
+        if pool is None:
+            nil = resolve_round(clauses, new, resolved, stats, budget)
+        else:
+            nil = resolve_round_parallel(clauses, new, previous, stats, budget, pool, jobs)
+        stats.end_round(goal, clauses, new)
+        if nil is not None: return goal, nil
         
-        new = remove_redundant(new, clauses)
-        clauses = remove_redundant(clauses, new)
-        if new.issubset(clauses): return goal, None
+        previous = {c: c.sos for c in clauses}
+        counts["duplicates"] += counts["resolvents"] - produced - len(new)
+        size = len(new)
+        new = stats.timed("remove_redundant", remove_redundant, new, clauses)
+        counts["subsumed"] += size - len(new)
+        clauses = stats.timed("remove_redundant", remove_redundant, clauses, new)
+        size = len(new)
+        new -= clauses
+        counts["known"] += size - len(new)
+        if not new: return goal, None
 
         clauses.update(new)
         new.clear()
@@ -119,7 +353,23 @@ def print_resolution_result(goal: Clause, resolvent: Clause):
         print_dashed_ln()
     print(f"[CONCLUSION]: {goal} is {'true' if conclusion else 'unknown'}")
 
-def cooking(clauses: 'set[Clause]', user_cmds):
+def print_stats(stats: Stats):
+    print("[STATS]:", *(f"{k}={v}" for k, v in stats.counts.items()), f"peak_clauses={stats.peak}")
+    print("[TIME]:", *(f"{k}={t:.6f}s" for k, t in stats.time.items()))
+
+def query(clauses: 'set[Clause]', goal: Clause, args: argparse.Namespace, pool: Pool=None):
+    stats = Stats(args.trace, timing=args.stats or args.trace is not None)
+    budget = Budget(args.max_clauses, args.max_rounds, args.timeout, args.max_memory)
+    try:
+        print_resolution_result(*resolution(clauses, goal, stats, budget, pool, args.jobs))
+    except BudgetExhausted as e:
+        print(f"[REASON]: {e}")
+        print_resolution_result(goal, None)
+    if args.stats: print_stats(stats)
+
+def cooking(
+        clauses: 'set[Clause]', user_cmds, args: argparse.Namespace, pool: Pool=None
+    ):
     print(f"Constructed with knowledge:")
     print(*clauses, sep='\n')
 
@@ -127,7 +377,7 @@ def cooking(clauses: 'set[Clause]', user_cmds):
         print(f"\nUser's command: {clause} {cmd}")
 
         if cmd == '?':
-            print_resolution_result(*resolution(clauses.copy(), clause))
+            query(clauses.copy(), clause, args, pool)
         elif cmd == '+':
             clauses.add(clause)
             print(f"Added {clause}")
@@ -136,16 +386,20 @@ def cooking(clauses: 'set[Clause]', user_cmds):
             print(f"removed {clause}")
 
 def lines(file):
-    return [line.rstrip().lower() for line in open(file) if line[0] != '#']
+    with open(file) as f:
+        text = f.read().lower()
+    return [line.rstrip() for line in text.splitlines() if line[:1] != '#']
 
 def input_clauses(lines: 'list[str]'):
-    return {Clause(line) for line in lines[:-1]}, Clause(lines[-1])
+    return set(map(Clause.parsed, lines[:-1])), Clause.parsed(lines[-1])
 
 def input_user_cmds(lines: 'list[str]'):
-    return (
-        (Clause(raw_clause), cmd)
-        for raw_clause, cmd in map(lambda l: l.rsplit(maxsplit=1), lines)
-    )
+    parsed = {} # repeated commands share one Clause, dropped with the generator
+    for raw_clause, cmd in (line.rsplit(maxsplit=1) for line in lines):
+        clause = parsed.get(raw_clause)
+        if clause is None:
+            clause = parsed[raw_clause] = Clause.parsed(raw_clause)
+        yield clause, cmd
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -158,19 +412,32 @@ def parse_arguments():
     parser_cooking.add_argument("clauses")
     parser_cooking.add_argument("user_cmds")
 
-    return parser.parse_args()
+    for subparser in (parser_resolution, parser_cooking):
+        subparser.add_argument("--stats", action="store_true")
+        subparser.add_argument("--trace", type=argparse.FileType('w'))
+        subparser.add_argument("--max-clauses", type=int, default=inf)
+        subparser.add_argument("--max-rounds", type=int, default=inf)
+        subparser.add_argument("--timeout", type=float, default=inf)
+        subparser.add_argument("--max-memory", type=float, default=inf)
+        subparser.add_argument("--jobs", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.max_memory < inf and psutil is None and not os.path.exists("/proc/self/statm"):
+        parser.error("--max-memory needs psutil on this platform")
+    return args
 
 def main():
     args = parse_arguments()
 
     clauses, goal = input_clauses(lines(args.clauses))
 
-    if args.task == "resolution":
-        print_resolution_result(*resolution(clauses, goal))
-    elif args.task == "cooking":
-        user_cmds = input_user_cmds(lines(args.user_cmds))
-        clauses.add(goal)
-        cooking(clauses, user_cmds)
+    with Pool(args.jobs) if args.jobs > 1 else nullcontext() as pool:
+        if args.task == "resolution":
+            query(clauses, goal, args, pool)
+        elif args.task == "cooking":
+            user_cmds = input_user_cmds(lines(args.user_cmds))
+            clauses.add(goal)
+            cooking(clauses, user_cmds, args, pool)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+import argparse, csv, io, json, os, platform, re, tracemalloc, numpy as np
+from collections import Counter
+from contextlib import redirect_stdout
+from math import inf, log2
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from solution import ID3
+
+class DictID3:
+    def __init__(self, id3_depth: int):
+        self.depth = id3_depth
+
+    def id3(self, D: 'list[dict]', D_parent: 'list[dict]', X: 'list[str]', y: str, depth=1):
+        if not D:
+            return most_common(row[y] for row in D_parent)
+
+        v = most_common(row[y] for row in D)
+        if not X or all(row[y] == v for row in D) or depth > self.depth:
+            return v
+
+        x = min(X, key=lambda x: (-IG(D, x, y), x))
+        X_x = [x_i for x_i in X if x_i != x]
+        return x, {
+            v: self.id3([row for row in D if row[x] == v], D, X_x, y, depth+1)
+            for v in sorted({row[x] for row in D})
+        }
+
+    def fit(self, data: str):
+        D = list(csv.DictReader(open(data)))
+        *X, y = D[0].keys()
+        self.tree = self.id3(D, D, sorted(X), y)
+
+    def predict(self, data: str):
+        D = list(csv.DictReader(open(data)))
+        y = list(D[0].keys())[-1]
+        fallback = most_common(row[y] for row in D)
+
+        correct = 0
+        for row in D:
+            tree = self.tree
+            while type(tree) == tuple:
+                tree = tree[1].get(row[tree[0]], fallback)
+            correct += tree == row[y]
+        print(f"[ACCURACY]: {correct / len(D):.5f}")
+
+def most_common(iterable):
+    return min(Counter(iterable).items(), key=lambda v_cnt: (-v_cnt[1], v_cnt[0]))[0]
+
+def entropy(D: 'list[dict]', y: str):
+    return -sum(
+        cnt / len(D) * log2(cnt / len(D)) for cnt in Counter(row[y] for row in D).values()
+    )
+
+def IG(D: 'list[dict]', x: str, y: str):
+    sigma = 0
+    for v in {row[x] for row in D}:
+        D_xv = [row for row in D if row[x] == v]
+        sigma += len(D_xv) / len(D) * entropy(D_xv, y)
+    return entropy(D, y) - sigma
+
+engines = {
+    "dict": lambda args: (DictID3(args.depth), {}),
+    "id3": lambda args: (ID3(args.depth, args.jobs), {}),
+    "stream": lambda args: (ID3(args.depth), {"chunk_size": args.chunk_size}),
+}
+
+def synthetic(
+        n_rows: int, n_features: int, cardinality: int, n_classes: int, noise: float,
+        rng: np.random.Generator
+    ):
+    X = rng.integers(0, cardinality, (n_rows, n_features))
+    relevant = min(3, n_features)
+    concept = rng.integers(0, n_classes, cardinality ** relevant)
+    y = concept[np.ravel_multi_index(X[:, :relevant].T, (cardinality,) * relevant)]
+    noisy = rng.random(n_rows) < noise
+    y[noisy] = rng.integers(0, n_classes, np.count_nonzero(noisy))
+    return X, y
+
+def write_csv(file: str, X: np.ndarray, y: np.ndarray):
+    with open(file, 'w') as f:
+        f.write(','.join([*(f"f{i}" for i in range(X.shape[1])), "label"]) + '\n')
+        f.writelines(
+            ','.join([*(f"v{v}" for v in row), f"c{label}"]) + '\n'
+            for row, label in zip(X.tolist(), y.tolist())
+        )
+
+def corpus(directory: str, args: argparse.Namespace):
+    rng = np.random.default_rng(args.seed)
+    for n_rows in args.rows:
+        name = f"synthetic_{n_rows}_{args.features}x{args.cardinality}"
+        n_test = max(1, round(n_rows * args.test_fraction))
+        params = (args.features, args.cardinality, args.classes, args.noise, rng)
+        X, y = synthetic(n_rows + n_test, *params)
+        train, test = (os.path.join(directory, f"{name}_{split}.csv") for split in ("train", "test"))
+        write_csv(train, X[:n_rows], y[:n_rows])
+        write_csv(test, X[n_rows:], y[n_rows:])
+        yield name, n_rows, train, test
+
+def run(engine: str, train: str, test: str, args: argparse.Namespace):
+    model, options = engines[engine](args)
+    with redirect_stdout(io.StringIO()) as output:
+        start = perf_counter()
+        model.fit(train, **options)
+        fitted = perf_counter()
+        model.predict(test)
+        predicted = perf_counter()
+    accuracy = float(re.search(r"\[ACCURACY\]: (\S+)", output.getvalue())[1])
+    return fitted - start, predicted - fitted, accuracy
+
+def benchmark(directory: str, args: argparse.Namespace):
+    for name, n_rows, train, test in corpus(directory, args):
+        for engine in args.engines:
+            fit_times, predict_times = [], []
+            for _ in range(args.repeat):
+                fit_time, predict_time, accuracy = run(engine, train, test, args)
+                fit_times.append(fit_time)
+                predict_times.append(predict_time)
+
+            tracemalloc.start()
+            run(engine, train, test, args)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            result = {
+                "name": name, "engine": engine, "rows": n_rows,
+                "features": args.features, "cardinality": args.cardinality,
+                "accuracy": accuracy, "fit_seconds": min(fit_times),
+                "predict_seconds": min(predict_times), "peak_memory_mb": peak_memory / 2**20
+            }
+            print(json.dumps(result))
+            yield result
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--rows", type=int, nargs='*', default=[1000, 10000])
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--cardinality", type=int, default=4)
+    parser.add_argument("--classes", type=int, default=2)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--test-fraction", type=float, default=0.25)
+    parser.add_argument("--depth", type=int, default=inf)
+    parser.add_argument("--engines", nargs='*', choices=list(engines), default=list(engines))
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus")
+    parser.add_argument("--report")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+
+    if args.corpus:
+        os.makedirs(args.corpus, exist_ok=True)
+        results = list(benchmark(args.corpus, args))
+    else:
+        with TemporaryDirectory() as directory:
+            results = list(benchmark(directory, args))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({
+                "python": platform.python_version(), "platform": platform.platform(),
+                "args": {
+                    k: v if v != inf else None for k, v in vars(args).items()
+                    if k not in ("corpus", "report")
+                },
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
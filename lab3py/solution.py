@@ -1,131 +1,507 @@
-import argparse, csv
-from collections import Counter
-from math import inf, log2
+import argparse, csv, hashlib, io, os, numpy as np
+from contextlib import contextmanager, redirect_stdout
+from functools import reduce
+from itertools import islice
+from math import inf, sqrt
+from multiprocessing import Pool
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+class Dataset:
+    def __init__(self, header: 'list[str]', codes: np.ndarray, vocabs: 'list[np.ndarray]'):
+        self.header = header
+        self.codes = codes
+        self.vocabs = vocabs
+    
+    @staticmethod
+    def read(file: str, like: 'Dataset'=None, chunk_size=2**12):
+        fixed = like.vocabs[:-1] if like is not None else []
+        chunks = [] # per column (vocab, codes), local to the chunk unless the vocab is fixed
+        for header, columns in Dataset.scan(file, chunk_size):
+            if like is not None:
+                columns = columns[[*map(header.index, like.header[:-1]), -1]]
+            chunk = []
+            for i, column in enumerate(columns):
+                if i < len(fixed):
+                    vocab, code = fixed[i], encode(column, fixed[i])
+                else:
+                    vocab, code = np.unique(column, return_inverse=True)
+                chunk.append((vocab, code.astype(code_dtype([vocab]))))
+            chunks.append(chunk)
+        if like is not None:
+            header = [*like.header[:-1], header[-1]]
+
+        vocabs = [*fixed, *(
+            reduce(np.union1d, (chunk[i][0] for chunk in chunks))
+            for i in range(len(fixed), len(header))
+        )]
+        codes = np.empty((len(header), sum(len(chunk[0][1]) for chunk in chunks)), code_dtype(vocabs))
+        start = 0
+        for chunk in chunks:
+            stop = start + len(chunk[0][1])
+            for i, (vocab, code) in enumerate(chunk):
+                codes[i, start:stop] = code if i < len(fixed) else np.searchsorted(vocabs[i], vocab)[code]
+            start = stop
+        
+        return Dataset(header, codes, vocabs)
+
+    @staticmethod
+    def scan(file: str, chunk_size: int):
+        with open(file) as f:
+            rows = filter(None, csv.reader(f))
+            header = next(rows)
+            while chunk := list(islice(rows, chunk_size)):
+                yield header, np.array(chunk, dtype=str).T
+    
+    def __len__(self):
+        return self.codes.shape[1]
 
 class Leaf:
-    def __init__(self, value: str):
+    def __init__(self, value: int):
         self.value = value
 
 class Node:
-    def __init__(self, feature: str):
+    def __init__(self, feature: int, value: int):
         self.feature = feature
+        self.value = value
         self.subtrees = []
 
+class Tree:
+    def __init__(self, feature: np.ndarray, label: np.ndarray, offset: np.ndarray, children: np.ndarray):
+        self.feature = feature
+        self.label = label
+        self.offset = offset
+        self.children = children
+
+    @staticmethod
+    def compile(tree: 'Leaf | Node', sizes: 'list[int]'):
+        feature, label, offset, children = [], [], [], []
+        nodes = [tree]
+        for t in nodes:
+            if type(t) == Leaf:
+                feature.append(-1)
+                label.append(t.value)
+                offset.append(-1)
+                continue
+
+            feature.append(t.feature)
+            label.append(t.value)
+            offset.append(len(children))
+            table = [-1] * (sizes[t.feature] + 1) # last slot catches unseen values
+            for v, s in t.subtrees:
+                table[v] = len(nodes)
+                nodes.append(s)
+            children += table
+
+        return Tree(*(
+            np.array(array, dtype=np.intp) for array in (feature, label, offset, children)
+        ))
+
+    def expand(self, sizes: 'list[int]', i=0):
+        if self.feature[i] < 0:
+            return Leaf(self.label[i])
+
+        node = Node(self.feature[i], self.label[i])
+        children = self.children[self.offset[i]:self.offset[i] + sizes[self.feature[i]]]
+        for v in np.flatnonzero(children >= 0):
+            node.subtrees.append((v, self.expand(sizes, children[v])))
+        return node
+
+    def decide(self, codes: np.ndarray, depth=inf):
+        node = np.zeros(codes.shape[1], dtype=np.intp)
+        active = np.arange(codes.shape[1])
+        level = 1
+        while len(active) and level <= depth: # rows stopped at inner nodes take their majority label
+            x = self.feature[node[active]]
+            active, x = active[x >= 0], x[x >= 0]
+            node[active] = self.children[self.offset[node[active]] + codes[x, active]]
+            active = active[node[active] >= 0]
+            level += 1
+        return np.where(node >= 0, self.label[node], -1)
+
+
 class ID3:
-    def __init__(self, id3_depth: int):
+    def __init__(self, id3_depth: int, jobs: int=1):
         self.depth = id3_depth
+        self.jobs = jobs
+        self.pool = None
     
-    def id3(self, 
-        D: 'list[dict]', D_parent: 'list[dict]', X: 'list[str]', y: str, depth=1
-    ):
-        if not D:
-            v = most_common(row[y] for row in D_parent)
+    def id3(self, D: slice, D_parent: slice, X: np.ndarray, depth=1):
+        y = self.data.codes[-1]
+        rows = self.rows[D]
+        if not len(rows):
+            v = most_common(y[self.rows[D_parent]])
             return Leaf(v)
         
-        v = most_common(row[y] for row in D)
-        if not X or all(map(lambda row: row[y] == v, D)) \
+        v = most_common(y[rows])
+        if not X.any() or (y[rows] == v).all() \
         or depth > self.depth:
             return Leaf(v)
         
-        IG_Dx = sorted(
-            map(lambda x: (x, IG(D, x, y)), X),
-            key=lambda x_ig: (-x_ig[1], x_ig[0])
-        )
-        print_information_gain(IG_Dx)
+        IG_Dx = self.rank(X, IG(self.data, rows, np.flatnonzero(X)))
+        print_information_gain([(self.data.header[x], ig) for x, ig in IG_Dx])
         x = IG_Dx[0][0]
 
-        node = Node(x)
-        for v in V(x, D):
-            D_xv = list(filter(lambda row: row[x] == v, D))
-            X_x = list(filter(lambda x_i: x_i != x, X))
-
-            t = self.id3(D_xv, D, X_x, y, depth+1)
-            node.subtrees.append((v, t))
+        node = Node(x, v)
+        bounds = partition(rows, self.data.codes[x])
+        branches = [
+            (v, slice(D.start + start, D.start + end))
+            for v, (start, end) in enumerate(zip(bounds, bounds[1:])) if start != end
+        ]
+        X[x] = False
+        if self.pool is not None and depth == 1:
+            tasks = [(D_v, D, X, depth+1) for _, D_v in branches]
+            for (v, _), (output, t) in zip(branches, self.pool.imap(id3_subtree, tasks)):
+                print(output, end="")
+                node.subtrees.append((v, t))
+        else:
+            for v, D_v in branches:
+                node.subtrees.append((v, self.id3(D_v, D, X, depth+1)))
+        X[x] = True
         return node
 
-    def fit(self, data: str):
-        D = input_csv(data)
-        fields = list(D[0].keys())
-        X, y = sorted(fields[:-1]), fields[-1]
+    def rank(self, X: np.ndarray, gains: np.ndarray):
+        header = self.data.header
+        return sorted(
+            zip(np.flatnonzero(X), gains),
+            key=lambda x_ig: (-round(x_ig[1], 12), header[x_ig[0]]) # ties up to rounding error go by name
+        )
 
-        self.tree = self.id3(D, D, X, y)
+    def stream(self, data: str, chunk_size: int):
+        vocabs, n = None, 0
+        for header, columns in Dataset.scan(data, chunk_size):
+            n += columns.shape[1]
+            uniques = [np.unique(column) for column in columns]
+            vocabs = uniques if vocabs is None else [*map(np.union1d, vocabs, uniques)]
+        self.data = Dataset(header, np.empty((len(header), 0), code_dtype(vocabs)), vocabs)
+        reserve(n)
 
-        print(f"[BRANCHES]:")
-        print_branches(self.tree)
-    
-    @staticmethod
-    def decide(tree: 'Leaf | Node', row: dict):
-        if type(tree) == Leaf:
-            return tree.value
+        k, sizes = len(vocabs[-1]), np.array([len(vocab) for vocab in vocabs[:-1]])
+        starts = np.cumsum(sizes) - sizes
+        gains = {}
+        self.tree = Leaf(-2)
+        frontier = [(None, None, np.ones(len(sizes), dtype=bool))]
+        depth = 1
+        while frontier:
+            # pending nodes are leaves labelled -2 - i, i being their frontier index
+            routing = Tree.compile(self.tree, list(map(len, vocabs)))
+            counts = np.zeros((len(frontier), k), dtype=np.int64)
+            table = np.zeros((len(frontier), sizes.sum(), k), dtype=np.int64)
+            for _, columns in Dataset.scan(data, chunk_size):
+                codes = np.array(list(map(encode, columns, vocabs)), dtype=np.intp)
+                node = -2 - routing.decide(codes)
+                rows = np.flatnonzero(node >= 0)
+                node, y = node[rows], codes[-1][rows]
+                counts += np.bincount(node * k + y, minlength=counts.size).reshape(counts.shape)
+                x_v = (node * sizes.sum() + starts[:, None] + codes[:-1, rows]) * k + y
+                table += np.bincount(x_v.ravel(), minlength=table.size).reshape(table.shape)
 
-        for v, t in tree.subtrees:
-            if row[tree.feature] == v:
-                return ID3.decide(t, row)
+            next_frontier = []
+            for i, (parent, v_parent, X) in enumerate(frontier):
+                v = counts[i].argmax()
+                if not X.any() or counts[i, v] == counts[i].sum() or depth > self.depth:
+                    t = Leaf(v)
+                else:
+                    features = np.flatnonzero(X)
+                    IG_Dx = self.rank(X, gain(counts[i], np.concatenate([
+                        table[i, starts[x]:starts[x] + sizes[x]] for x in features
+                    ]), sizes[features]))
+                    x = IG_Dx[0][0]
+                    t = Node(x, v)
+                    gains[id(t)] = [(self.data.header[x], ig) for x, ig in IG_Dx]
+                    X_t = X.copy()
+                    X_t[x] = False
+                    for v in np.flatnonzero(table[i, starts[x]:starts[x] + sizes[x]].sum(1)):
+                        t.subtrees.append((v, Leaf(-2 - len(next_frontier))))
+                        next_frontier.append((t, len(t.subtrees) - 1, X_t))
 
-    def predict(self, data: str):
-        D = input_csv(data)
-        y = list(D[0].keys())[-1]
-        
-        labels = sorted(V(y, D))
-        label_index = {l_i: i for i, l_i in enumerate(labels)}
-        
-        predictions = ""
-        correct, total = 0, len(D)
-        confusion_matrix = [[0 for _ in labels] for _ in labels]
-        for row in D:
-            decision = ID3.decide(self.tree, row)
-            if decision is None:
-                decision = most_common(row[y] for row in D)
-            
-            predictions += f" {decision}"
-            correct += decision == row[y]
-            confusion_matrix[label_index[row[y]]][label_index[decision]] += 1
-        
-        print(f"[PREDICTIONS]:{predictions}")
-        print(f"[ACCURACY]: {correct / total:.5f}")
-        print(f"[CONFUSION_MATRIX]:")
-        for row in confusion_matrix: print(*row)
-
-def most_common(iterable):
-    return sorted(
-        Counter(iterable).most_common(),
-        key=lambda v_cnt: (-v_cnt[1], v_cnt[0])
-    )[0][0]
-
-def V(x: str, D: 'list[dict]'):
-    return {row[x] for row in D}
-
-def entropy(D: 'list[dict]', y: str):
-    pmf_y = map(
-        lambda cnt: cnt / len(D),
-        Counter(row[y] for row in D).values()
-    )
-
-    return -sum(P_yi * log2(P_yi) for P_yi in pmf_y)
-
-def IG(D: 'list[dict]', x: str, y: str):
-    sigma = 0
-    for v in V(x, D):
-        D_xv = list(filter(lambda row: row[x] == v, D))
-        sigma += len(D_xv) / len(D) * entropy(D_xv, y)
+                if parent is None:
+                    self.tree = t
+                else:
+                    parent.subtrees[v_parent] = (parent.subtrees[v_parent][0], t)
+            frontier = next_frontier
+            depth += 1
+
+        print_gains(self.tree, gains)
+
+    def fit(self, data: str, chunk_size: int=None):
+        if chunk_size:
+            self.stream(data, chunk_size)
+        else:
+            self.grow(data)
+
+        self.compiled = Tree.compile(self.tree, list(map(len, self.data.vocabs)))
+
+    def fit_cached(self, data: str, chunk_size: int, cache: str):
+        digest = fingerprint(data, self.depth)
+        path = os.path.join(cache, f"{digest}.npz")
+        if not (os.path.exists(path) and self.load(path, digest)):
+            with redirect_stdout(io.StringIO()) as log:
+                self.fit(data, chunk_size)
+            self.log = log.getvalue()
+            os.makedirs(cache, exist_ok=True)
+            self.save(path, digest)
+        print(self.log, end="")
+
+    def save(self, file: str, digest: str):
+        tree = self.compiled
+        with open(f"{file}.tmp", 'wb') as f:
+            np.savez(
+                f, format=np.array(model_format), digest=np.array(digest),
+                header=np.array(self.data.header), log=np.array(self.log),
+                feature=tree.feature, label=tree.label, offset=tree.offset, children=tree.children,
+                **{f"vocab_{i}": vocab for i, vocab in enumerate(self.data.vocabs)}
+            )
+        os.replace(f"{file}.tmp", file)
+
+    def load(self, file: str, digest: str=None):
+        with np.load(file) as f: # an archive of another format or training run is a miss
+            if "format" not in f or int(f["format"]) != model_format: return False
+            if digest is not None and str(f["digest"]) != digest: return False
+            header = list(f["header"])
+            vocabs = [f[f"vocab_{i}"] for i in range(len(header))]
+            self.data = Dataset(header, np.empty((len(header), 0), code_dtype(vocabs)), vocabs)
+            self.compiled = Tree(f["feature"], f["label"], f["offset"], f["children"])
+            self.log = str(f["log"])
+        self.tree = self.compiled.expand(list(map(len, vocabs)))
+        return True
+
+    def grow(self, data: str):
+        self.data = Dataset.read(data)
+        self.rows = np.arange(len(self.data))
+        reserve(len(self.data))
+        D = slice(0, len(self.data))
+        X = np.ones(len(self.data.header) - 1, dtype=bool)
+
+        if self.jobs > 1:
+            with self.workers(share_rows=True) as self.pool:
+                self.tree = self.id3(D, D, X)
+            self.pool = None
+        else:
+            self.tree = self.id3(D, D, X)
     
-    return entropy(D, y) - sigma
+    def branches(self, depth=inf):
+        print(f"[BRANCHES]:")
+        print_branches(self.tree, self.data, depth=depth)
+
+    @contextmanager
+    def workers(self, share_rows=False):
+        with TemporaryDirectory() as directory:
+            np.save(f"{directory}/codes.npy", self.data.codes)
+            if share_rows:
+                np.save(f"{directory}/rows.npy", self.rows)
+                self.rows = np.load(f"{directory}/rows.npy", mmap_mode='r+')
+            shared = (self.depth, self.data.header, self.data.vocabs, directory)
+            with Pool(self.jobs, attach, shared) as pool:
+                yield pool
+            if share_rows:
+                self.rows = np.array(self.rows)
+
+    def cross_validate(self, data: str, k: int, depths: 'list[int]', seed=0):
+        self.data = Dataset.read(data)
+        reserve(len(self.data))
+        folds = np.array_split(np.random.default_rng(seed).permutation(len(self.data)), k)
+        tasks = [
+            (np.concatenate(folds[:i] + folds[i+1:]), fold, depths)
+            for i, fold in enumerate(folds)
+        ]
+
+        if self.jobs > 1:
+            with self.workers() as pool:
+                accuracies = np.array(pool.map(validate, tasks))
+        else:
+            accuracies = np.array([self.validate(*task) for task in tasks])
+
+        print(f"[CV]: {k} folds")
+        for depth, accuracy in zip(depths, accuracies.T):
+            print(f"[DEPTH]: {depth} [ACCURACY]: {accuracy.mean():.5f} [STD]: {accuracy.std():.5f}")
+
+    def validate(self, train: np.ndarray, test: np.ndarray, depths: 'list[int]'):
+        self.rows = train.copy()
+        D = slice(0, len(train))
+        X = np.ones(len(self.data.header) - 1, dtype=bool)
+        with redirect_stdout(io.StringIO()):
+            tree = Tree.compile(self.id3(D, D, X), list(map(len, self.data.vocabs)))
+
+        codes, y = self.data.codes[:, test], self.data.codes[-1][test]
+        accuracies = []
+        for depth in depths:
+            decisions = tree.decide(codes, depth)
+            y_pred = np.where(decisions >= 0, decisions, most_common(y))
+            accuracies.append(evaluate(y, y_pred, len(self.data.vocabs[-1]))[0])
+        return accuracies
+
+    def bag(self, seed: np.random.SeedSequence, max_features: int):
+        rng = np.random.default_rng(seed)
+        n, m = len(self.data), len(self.data.header) - 1
+        self.rows = rng.integers(0, n, n)
+        X = np.zeros(m, dtype=bool)
+        X[rng.choice(m, min(max_features, m), replace=False)] = True
+
+        D = slice(0, n)
+        with redirect_stdout(io.StringIO()):
+            tree = self.id3(D, D, X)
+        return Tree.compile(tree, list(map(len, self.data.vocabs)))
+
+    def decide(self, codes: np.ndarray, depth=inf):
+        return self.compiled.decide(codes, depth)
+
+    def predict(self, data: 'str | Dataset', depth=inf):
+        D = data if isinstance(data, Dataset) else Dataset.read(data, like=self.data)
+        y, y_vocab = self.data.vocabs[-1], D.vocabs[-1]
+        y_true = D.codes[-1]
+        fallback = most_common(y_true)
+        decisions = self.decide(D.codes, depth)
+
+        y_pred = np.where(decisions >= 0, encode(y, y_vocab)[decisions], fallback)
+        predictions = np.where(decisions >= 0, y[decisions], y_vocab[fallback])
+        accuracy, confusion_matrix = evaluate(y_true, y_pred, len(y_vocab))
+        print('\n'.join([
+            ' '.join(["[PREDICTIONS]:", *predictions]),
+            f"[ACCURACY]: {accuracy:.5f}",
+            "[CONFUSION_MATRIX]:",
+            *(' '.join(map(str, row)) for row in confusion_matrix)
+        ]))
+
+class Forest(ID3):
+    def __init__(self, id3_depth: int, jobs: int, n_trees: int, max_features: int=None, seed=0):
+        super().__init__(id3_depth, jobs)
+        self.n_trees = n_trees
+        self.max_features = max_features
+        self.seed = seed
+
+    def fit(self, data: str):
+        self.data = Dataset.read(data)
+        reserve(len(self.data))
+        m = len(self.data.header) - 1
+        tasks = [
+            (seed, self.max_features or max(1, round(sqrt(m))))
+            for seed in np.random.SeedSequence(self.seed).spawn(self.n_trees)
+        ]
+
+        start = perf_counter()
+        if self.jobs > 1:
+            with self.workers() as pool:
+                self.trees = pool.map(bag, tasks)
+        else:
+            self.trees = [self.bag(*task) for task in tasks]
+        elapsed = perf_counter() - start
+        print(f"[FOREST]: {self.n_trees} trees in {elapsed:.3f}s ({self.n_trees / elapsed:.1f} trees/s)")
+
+    def decide(self, codes: np.ndarray, depth=inf):
+        k = len(self.data.vocabs[-1])
+        votes = np.array([tree.decide(codes, depth) for tree in self.trees])
+        tree, row = np.nonzero(votes >= 0)
+        counts = np.bincount(
+            row * k + votes[tree, row], minlength=codes.shape[1] * k
+        ).reshape(-1, k)
+        # argmax keeps most_common's tie-breaking; rows no tree could route fall back
+        return np.where(counts.any(1), counts.argmax(1), -1)
+
+def evaluate(y_true: np.ndarray, y_pred: np.ndarray, k: int):
+    # y_pred may hold k for labels the test set never saw; they only count as misses
+    confusion_matrix = np.bincount(
+        y_true.astype(np.intp) * (k + 1) + y_pred, minlength=k * (k + 1)
+    ).reshape(k, k + 1)[:, :k]
+    return np.count_nonzero(y_true == y_pred) / len(y_true), confusion_matrix
+
+def attach(id3_depth: int, header: 'list[str]', vocabs: 'list[np.ndarray]', directory: str):
+    global model
+    model = ID3(id3_depth)
+    model.data = Dataset(header, np.load(f"{directory}/codes.npy", mmap_mode='r'), vocabs)
+    if os.path.exists(f"{directory}/rows.npy"):
+        model.rows = np.load(f"{directory}/rows.npy", mmap_mode='r+')
+    reserve(len(model.data))
+
+def bag(task: tuple):
+    return model.bag(*task)
+
+def validate(task: tuple):
+    return model.validate(*task)
+
+def id3_subtree(task: tuple):
+    with redirect_stdout(io.StringIO()) as output:
+        tree = model.id3(*task)
+    return output.getvalue(), tree
+
+model_format = 2 # version of the archives written by ID3.save and of their cached log
+
+def fingerprint(file: str, id3_depth: int):
+    digest = hashlib.sha256(f"{model_format}\n{id3_depth}\n".encode())
+    with open(file, 'rb') as f:
+        while chunk := f.read(2**20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def code_dtype(vocabs: 'list[np.ndarray]'):
+    return np.uint16 if max(map(len, vocabs)) < 2**16 - 1 else np.uint32
+
+def encode(column: np.ndarray, vocab: np.ndarray):
+    codes = np.searchsorted(vocab, column)
+    unseen = codes == len(vocab)
+    unseen[~unseen] = vocab[codes[~unseen]] != column[~unseen]
+    codes[unseen] = len(vocab)
+    return codes
+
+def partition(rows: np.ndarray, column: np.ndarray):
+    keys = column[rows]
+    rows[:] = rows[np.argsort(keys, kind='stable')]
+    return np.concatenate(([0], np.cumsum(np.bincount(keys))))
+
+def most_common(labels: np.ndarray):
+    return np.bincount(labels).argmax()
+
+nlogn = np.zeros(1)
+
+def reserve(n: int):
+    global nlogn
+    if n >= len(nlogn): # counts never exceed the row count, so n·log2(n) becomes a lookup
+        m = np.arange(n + 1)
+        nlogn = m * np.log2(m, out=np.zeros(m.shape), where=m > 0)
+
+def xlogx(n: np.ndarray):
+    return nlogn[n]
+
+def entropy(counts: np.ndarray):
+    n = counts.sum(-1)
+    return (xlogx(n) - xlogx(counts).sum(-1)) / n
+
+def IG(data: Dataset, D: np.ndarray, X: 'list[int]'):
+    y, k = data.codes[-1][D], len(data.vocabs[-1])
+    sizes = np.array([len(data.vocabs[x]) for x in X])
+    table = np.concatenate([
+        np.bincount(data.codes[x][D].astype(np.intp) * k + y, minlength=size * k)
+        for x, size in zip(X, sizes)
+    ]).reshape(-1, k)
+    return gain(np.bincount(y, minlength=k), table, sizes)
+
+def gain(counts: np.ndarray, table: np.ndarray, sizes: np.ndarray):
+    n_xv = xlogx(table.sum(1)) - xlogx(table).sum(1)
+    sigma = np.add.reduceat(n_xv, np.cumsum(sizes) - sizes) / counts.sum()
+    return entropy(counts) - sigma
 
 def print_information_gain(IG_Dx: 'list[tuple[float, str]]'):
     print(' '.join(map(
         lambda x_ig: f"IG({x_ig[0]})={x_ig[1]:.4f}", IG_Dx
     )))
 
-def print_branches(tree: 'Leaf | Node', string="", level=1):
-    if type(tree) == Leaf:
-        print(f"{string} {tree.value}")
+def print_gains(tree: 'Leaf | Node', gains: dict):
+    if type(tree) == Leaf: return
+
+    print_information_gain(gains[id(tree)])
+    for _, t in tree.subtrees:
+        print_gains(t, gains)
+
+def print_branches(tree: 'Leaf | Node', data: Dataset, string="", level=1, depth=inf):
+    if type(tree) == Leaf or level > depth:
+        print(f"{string} {data.vocabs[-1][tree.value]}")
         return
     
+    feature, vocab = data.header[tree.feature], data.vocabs[tree.feature]
     for v, t in tree.subtrees:
-        print_branches(t, ' '.join((string, f"{level}:{tree.feature}={v}")), level+1)
-
-def input_csv(file: str) -> 'list[dict]':
-    return [row for row in csv.DictReader(open(file))]
+        print_branches(
+            t, data, ' '.join((string, f"{level}:{feature}={vocab[v]}")), level+1, depth
+        )
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -133,15 +509,49 @@ def parse_arguments():
     parser.add_argument("train_data")
     parser.add_argument("test_data")
     parser.add_argument("id3_depth", type=int, nargs='?', default=inf)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--cache")
+    parser.add_argument("--depths", type=lambda s: [int(d) for d in s.split(',')])
+    parser.add_argument("--trees", type=int)
+    parser.add_argument("--max-features", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cv", type=int)
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.trees and (args.cache or args.chunk_size):
+        parser.error("--trees cannot be combined with --cache or --chunk-size")
+    if args.cv and (args.trees or args.cache or args.chunk_size):
+        parser.error("--cv cannot be combined with --trees, --cache or --chunk-size")
+    return args
 
 def main():
     args = parse_arguments()
 
-    model = ID3(args.id3_depth)
-    model.fit(args.train_data)
-    model.predict(args.test_data)
+    id3_depth = max(args.depths) if args.depths else args.id3_depth
+    if args.cv:
+        ID3(id3_depth, args.jobs).cross_validate(
+            args.train_data, args.cv, args.depths or [id3_depth], args.seed
+        )
+        return
+
+    if args.trees:
+        model = Forest(id3_depth, args.jobs, args.trees, args.max_features, args.seed)
+        model.fit(args.train_data)
+    else:
+        model = ID3(id3_depth, args.jobs)
+        if args.cache:
+            model.fit_cached(args.train_data, args.chunk_size, args.cache)
+        else:
+            model.fit(args.train_data, args.chunk_size)
+
+    test_data = Dataset.read(args.test_data, like=model.data)
+    for depth in args.depths or [inf]:
+        if args.depths:
+            print(f"[DEPTH]: {depth}")
+        if not args.trees:
+            model.branches(depth)
+        model.predict(test_data, depth)
 
 if __name__ == "__main__":
     main()
@@ -1,81 +1,297 @@
-import argparse, numpy as np
-from heapq import nlargest
-from itertools import islice
+import argparse, csv, io, json, os, numpy as np
+from contextlib import redirect_stdout
+from itertools import islice, product
+from multiprocessing import Barrier, Pool, Process
+from multiprocessing.sharedctypes import RawArray
+from time import perf_counter
 
-class NeuralNet:
-    def __init__(self, layers: 'tuple[int]', set_weights=True):
+class Population:
+    def __init__(self, layers: 'tuple[int]', params: np.ndarray):
         self.layers = layers
-        self.mse = np.inf
-        if not set_weights:
-            return
-        self.weights = [
-            np.random.normal(0, 0.01, (prev_layer, layer))
-            for prev_layer, layer in zip(layers, islice(layers, 1, None))
-        ]
-        self.biases = [
-            np.random.normal(0, 0.01, layer)
-            for layer in islice(layers, 1, None)
-        ]
-    
-    def __lt__(self, other: 'NeuralNet'):
-        return self.fit() < other.fit()
-    
-    def fit(self):
-        return 1 / (max(self.mse, 1e-9))
-    
-    def evaluate(self, x, y):
-        self.mse = np.mean(np.square(y - self.NN(x)))
-    
-    def NN(self, x):
-        for i in range(len(self.weights)):
-            x = x @ self.weights[i] + self.biases[i]
-            x = sigmoid(x) if i < len(self.weights) - 1 else x.T[0]
+        self.params = params
+        self.mse = np.full(len(params), np.inf)
+        # next generation and mutation scratch space, reused every generation
+        self.next = np.empty_like(self.params)
+        self.noise = np.empty_like(self.params)
+        self.uniform = np.empty_like(self.params)
+        self.mask = np.empty(self.params.shape, dtype=bool)
+
+    @staticmethod
+    def random(layers: 'tuple[int]', popsize: int, rng: np.random.Generator):
+        return Population(layers, rng.normal(0, 0.01, (popsize, n_params(layers))))
+
+    def unpack(self, params: np.ndarray):
+        weights, biases, start = [], [], 0
+        for prev_layer, layer in zip(self.layers, islice(self.layers, 1, None)):
+            end = start + prev_layer * layer
+            weights.append(params[:, start:end].reshape(-1, prev_layer, layer))
+            biases.append(params[:, end:end + layer])
+            start = end + layer
+        return weights, biases
+
+    def evaluate(self, x, y, params: np.ndarray=None):
+        return np.mean(np.square(y - self.NN(x, self.params if params is None else params)), axis=-1)
+
+    def NN(self, x, params: np.ndarray):
+        # x @ (pop × in × out) broadcasts to (pop × samples × out), one matmul per layer
+        weights, biases = self.unpack(params)
+        for i in range(len(weights)):
+            x = x @ weights[i] + biases[i][:, None]
+            x = sigmoid(x) if i < len(weights) - 1 else x[..., 0]
         return x
 
+    def fit(self):
+        return 1 / np.maximum(self.mse, 1e-9)
+
+    def elites(self, k: int):
+        if not k:
+            return np.empty(0, dtype=np.intp)
+        return np.argpartition(self.mse, k - 1)[:k]
+
+    def breed(
+            self, elites: np.ndarray, parents: np.ndarray, p: float, K: float,
+            rng: np.random.Generator, x, y
+        ):
+        n = len(elites)
+        children = self.next[n:]
+        noise, uniform, mask = self.noise[n:], self.uniform[n:], self.mask[n:]
+        np.take(self.params, elites, axis=0, out=self.next[:n])
+
+        np.take(self.params, parents[:, 0], axis=0, out=children)
+        np.take(self.params, parents[:, 1], axis=0, out=noise)
+        children += noise
+        children *= 0.5
+
+        rng.standard_normal(out=noise)
+        noise *= K
+        rng.random(out=uniform)
+        np.less(uniform, p, out=mask)
+        noise *= mask
+        children += noise
+
+        self.mse = np.concatenate((self.mse[elites], self.evaluate(x, y, children)))
+        self.params, self.next = self.next, self.params
+
+class Island:
+    def __init__(
+            self, index: int, every: int, migrants: int,
+            barrier: Barrier, outbox: np.ndarray, errors: np.ndarray
+        ):
+        self.index = index
+        self.every = every
+        self.migrants = migrants
+        self.barrier = barrier
+        self.outbox = outbox
+        self.errors = errors
+
+    def migrate(self, P: Population):
+        # ring topology: the best migrants replace the worst of the next island
+        top = P.elites(self.migrants)
+        self.outbox[self.index, :, :-1] = P.params[top]
+        self.outbox[self.index, :, -1] = P.mse[top]
+        self.barrier.wait()
+        worst = np.argpartition(P.mse, len(P.mse) - self.migrants)[-self.migrants:]
+        P.params[worst] = self.outbox[self.index - 1, :, :-1]
+        P.mse[worst] = self.outbox[self.index - 1, :, -1]
+        self.barrier.wait()
+
+    def report(self, i: int, P: Population):
+        self.errors[self.index] = P.mse.min()
+        self.barrier.wait()
+        if self.index == 0:
+            print(f"[Train error @{i}]: {self.errors.min():.6f}", flush=True)
+        self.barrier.wait()
+
+class Checkpoint:
+    def __init__(self, file: str, every: int):
+        self.file = file
+        self.every = every
+
+    def save(self, i: int, P: Population, rng: np.random.Generator):
+        with open(f"{self.file}.tmp", 'wb') as f:
+            np.savez(
+                f, iteration=i, params=P.params, mse=P.mse,
+                rng=np.array(json.dumps(rng.bit_generator.state))
+            )
+        os.replace(f"{self.file}.tmp", self.file)
+
+    def restore(self, layers: 'tuple[int]', popsize: int, rng: np.random.Generator):
+        with np.load(self.file) as f:
+            shape = f["params"].shape
+            if shape != (popsize, n_params(layers)):
+                raise ValueError(
+                    f"{self.file} holds {shape[0]} networks of {shape[1]} parameters, "
+                    f"but --popsize and --nn ask for {popsize} of {n_params(layers)}"
+                )
+            P = Population(layers, f["params"])
+            P.mse = f["mse"]
+            rng.bit_generator.state = json.loads(str(f["rng"]))
+            return P, int(f["iteration"]) + 1
+
 sigmoid = lambda x: 1 / (1 + np.exp(-x))
 
-def cross_mutate_evaluate(p1: NeuralNet, p2: NeuralNet, p: float, K: float, x, y):
-    child = NeuralNet(p1.layers, False)
-    child.weights = [
-        (w1 + w2) / 2 + \
-            np.random.normal(0, K, w1.shape) * np.random.binomial(1, p, w1.shape)
-        for w1, w2 in zip(p1.weights, p2.weights)
-    ]
-    child.biases = [
-        (b1 + b2) / 2 + \
-            np.random.normal(0, K, b1.shape) * np.random.binomial(1, p, b1.shape)
-        for b1, b2 in zip(p1.biases, p2.biases)
-    ]
-    child.evaluate(x, y)
+def n_params(layers: 'tuple[int]'):
+    return sum(
+        (prev_layer + 1) * layer
+        for prev_layer, layer in zip(layers, islice(layers, 1, None))
+    )
 
-    return child
+def select(fit: np.ndarray, size: int, rng: np.random.Generator):
+    wheel = np.cumsum(fit)
+    last = len(fit) - 1
+    first = np.minimum(np.searchsorted(wheel, rng.random(size) * wheel[-1], side='right'), last)
 
-def select(P: 'list[NeuralNet]', size: int):
-    sigma = sum(j.fit() for j in P)
-    p_sel = [i.fit() / sigma for i in P]
+    # the second spin skips the first parent's slice, so each pair is drawn without replacement
+    spin = rng.random(size) * (wheel[-1] - fit[first])
+    spin += np.where(spin >= wheel[first] - fit[first], fit[first], 0)
+    second = np.minimum(np.searchsorted(wheel, spin, side='right'), last)
+    tie = second == first # only reachable through rounding at a slice boundary
+    second[tie] = np.where(first[tie] < last, first[tie] + 1, first[tie] - 1)
 
-    return (np.random.choice(P, 2, False, p_sel) for _ in range(size))
+    return np.stack((first, second), axis=1)
 
 def genetic_algorithm(
-        P: 'list[NeuralNet]', x, y,
-        elitism: int, p: float, K: float, iter: int
+        P: Population, x, y,
+        elitism: int, p: float, K: float, iter: int, rng: np.random.Generator,
+        island: Island=None, checkpoint: Checkpoint=None, start=1
     ):
-    for net in P:
-        net.evaluate(x, y)
-    for i in range(1, iter + 1):
-        new_P = nlargest(elitism, P)
-        new_P.extend(
-            cross_mutate_evaluate(*parents, p, K, x, y)
-            for parents in select(P, len(P) - elitism)
-        )
-        P = new_P
+    if start == 1:
+        P.mse = P.evaluate(x, y)
+    for i in range(start, iter + 1):
+        fit = P.fit()
+        P.breed(P.elites(elitism), select(fit, len(fit) - elitism, rng), p, K, rng, x, y)
 
+        if island is not None and island.migrants and i % island.every == 0:
+            island.migrate(P)
         if i % 2000 == 0:
-            print(f"[Train error @{i}]: {max(P).mse:.6f}")
-    return max(P)
+            if island is None:
+                print(f"[Train error @{i}]: {P.mse.min():.6f}")
+            else:
+                island.report(i, P)
+        if checkpoint is not None and (i % checkpoint.every == 0 or i == iter):
+            checkpoint.save(i, P, rng)
+    return np.argmin(P.mse)
+
+def initialize(args: argparse.Namespace, layers: 'tuple[int]', rng: np.random.Generator, file: str):
+    checkpoint = Checkpoint(file, args.checkpoint_every) if file else None
+    if args.resume:
+        return (*checkpoint.restore(layers, args.popsize, rng), checkpoint)
+    return Population.random(layers, args.popsize, rng), 1, checkpoint
 
-def make_population(layers: 'tuple[int]', popsize: int):
-    return [NeuralNet(layers) for _ in range(popsize)]
+def evolve(
+        index: int, seed: np.random.SeedSequence, layers: 'tuple[int]', x, y,
+        args: argparse.Namespace, barrier: Barrier, outbox: RawArray, errors: RawArray,
+        results: RawArray
+    ):
+    rng = np.random.default_rng(seed)
+    size = n_params(layers) + 1 # parameters followed by their MSE
+    island = Island(
+        index, args.migrate_every, args.migrants, barrier,
+        np.frombuffer(outbox).reshape(args.islands, args.migrants, size),
+        np.frombuffer(errors)
+    )
+
+    file = args.checkpoint and island_file(args.checkpoint, index)
+    try:
+        P, start, checkpoint = initialize(args, layers, rng, file)
+        best = genetic_algorithm(
+            P, x, y, args.elitism, args.p, args.K, args.iter, rng, island, checkpoint, start
+        )
+    except BaseException:
+        barrier.abort() # the other islands would otherwise wait for this one forever
+        raise
+    result = np.frombuffer(results).reshape(args.islands, size)[index]
+    result[:-1], result[-1] = P.params[best], P.mse[best]
+
+def island_file(checkpoint: str, index: int):
+    return "{0}.{2}{1}".format(*os.path.splitext(checkpoint), index)
+
+def islands(layers: 'tuple[int]', x, y, args: argparse.Namespace):
+    if args.resume: # islands resumed at different iterations would meet at the wrong barriers
+        iterations = []
+        for index in range(args.islands):
+            with np.load(island_file(args.checkpoint, index)) as f:
+                iterations.append(int(f["iteration"]))
+        if len(set(iterations)) > 1:
+            raise ValueError(f"island checkpoints are at different iterations: {iterations}")
+
+    size = n_params(layers) + 1
+    barrier = Barrier(args.islands)
+    outbox = RawArray('d', args.islands * args.migrants * size)
+    errors = RawArray('d', args.islands)
+    results = RawArray('d', args.islands * size)
+
+    seeds = np.random.SeedSequence(args.seed).spawn(args.islands)
+    processes = [
+        Process(target=evolve, args=(
+            i, seed, layers, x, y, args, barrier, outbox, errors, results
+        ))
+        for i, seed in enumerate(seeds)
+    ]
+    for process in processes: process.start()
+    for process in processes: process.join()
+    if any(process.exitcode for process in processes):
+        raise RuntimeError("an island process failed")
+
+    results = np.frombuffer(results).reshape(args.islands, size)
+    return results[np.argmin(results[:, -1])]
+
+def fit(args: argparse.Namespace, x, y):
+    layers = len(x[0]), *map(int, args.nn[:-1].split('s')), 1
+    if args.islands > 1:
+        *params, mse = islands(layers, x, y, args)
+        return Population(layers, np.array(params)[None]), mse
+
+    rng = np.random.default_rng(args.seed)
+    P, start, checkpoint = initialize(args, layers, rng, args.checkpoint)
+    best = genetic_algorithm(
+        P, x, y, args.elitism, args.p, args.K, args.iter, rng, None, checkpoint, start
+    )
+    return Population(layers, P.params[best:best + 1]), P.mse[best]
+
+def load(*arrays: np.ndarray):
+    global data
+    data = arrays
+
+def trial(args: argparse.Namespace):
+    x_train, y_train, x_test, y_test = data
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        P, train_mse = fit(args, x_train, y_train)
+    seconds = perf_counter() - start
+    test_mse, = P.evaluate(x_test, y_test)
+
+    return {
+        **{key: getattr(args, key) for key in swept},
+        "train_mse": train_mse, "test_mse": test_mse,
+        "seconds": seconds, "generations_per_second": args.iter / seconds
+    }
+
+def sweep(configs: 'list[argparse.Namespace]', args: argparse.Namespace, *arrays: np.ndarray):
+    columns = [*swept, "train_mse", "test_mse", "seconds", "generations_per_second"]
+    print(' '.join(f"{column:>12}" for column in columns))
+    # island runs spawn their own processes, which pool workers may not do
+    if args.jobs > 1 and args.islands == 1:
+        with Pool(args.jobs, load, arrays) as pool:
+            results = [print_trial(result) for result in pool.imap(trial, configs)]
+    else:
+        load(*arrays)
+        results = [print_trial(trial(config)) for config in configs]
+
+    if args.results:
+        with open(args.results, 'w', newline='') as f:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+def print_trial(result: dict):
+    print(' '.join(
+        f"{value:>12.6g}" if isinstance(value, float) else f"{value:>12}"
+        for value in result.values()
+    ), flush=True)
+    return result
+
+swept = ("nn", "popsize", "elitism", "p", "K", "iter", "seed")
 
 def input_csv(file: str):
     x_y = np.array([
@@ -90,31 +306,49 @@ def parse_arguments():
 
     parser.add_argument("--train")
     parser.add_argument("--test")
-    parser.add_argument("--nn")
-    parser.add_argument("--popsize", type=int)
-    parser.add_argument("--elitism", type=int)
-    parser.add_argument("--p", type=float)
-    parser.add_argument("--K", type=float)
-    parser.add_argument("--iter", type=int)
-    
-    return parser.parse_args()
+    parser.add_argument("--nn", nargs='+')
+    parser.add_argument("--popsize", type=int, nargs='+')
+    parser.add_argument("--elitism", type=int, nargs='+')
+    parser.add_argument("--p", type=float, nargs='+')
+    parser.add_argument("--K", type=float, nargs='+')
+    parser.add_argument("--iter", type=int, nargs='+')
+    parser.add_argument("--seed", type=int, nargs='+', default=[3])
+    parser.add_argument("--islands", type=int, default=1)
+    parser.add_argument("--migrate-every", type=int, default=100)
+    parser.add_argument("--migrants", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--results")
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--checkpoint-every", type=int, default=1000)
+    parser.add_argument("--resume", action='store_true')
+
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.checkpoint and any(len(getattr(args, key)) > 1 for key in swept):
+        parser.error("--checkpoint cannot be combined with a sweep")
+    if args.islands > 1 and not 0 < args.migrants < min(args.popsize):
+        parser.error("--migrants must be at least 1 and less than --popsize")
+    return args
 
 def main():
     args = parse_arguments()
 
-    np.random.seed(3)
     x_train, y_train = input_csv(args.train)
     x_test, y_test = input_csv(args.test)
 
-    layers = len(x_train[0]), *map(int, args.nn[:-1].split('s')), 1
+    # every combination of the listed values is one run; a single one prints as before
+    configs = [
+        argparse.Namespace(**{**vars(args), **dict(zip(swept, values))})
+        for values in product(*(getattr(args, key) for key in swept))
+    ]
+    if len(configs) > 1:
+        sweep(configs, args, x_train, y_train, x_test, y_test)
+        return
 
-    net = genetic_algorithm(
-        make_population(layers, args.popsize),
-        x_train, y_train,
-        args.elitism, args.p, args.K, args.iter
-    )
-    net.evaluate(x_test, y_test)
-    print(f"[Test error]: {net.mse:.6f}")
+    P, _ = fit(configs[0], x_train, y_train)
+    mse, = P.evaluate(x_test, y_test)
+    print(f"[Test error]: {mse:.6f}")
 
 if __name__ == "__main__":
     main()